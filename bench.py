@@ -0,0 +1,332 @@
+"""Benchmarks for all the practice algorithms, checking how they scale.
+
+Each benchmark is run on inputs of increasing size, reporting the wall time,
+peak memory and (where the algorithm can be instrumented) operation count for
+every size. A scaling exponent is then estimated by fitting a line through the
+log-log measurements, and the run fails if it exceeds what the algorithm's
+complexity allows (for example when an O(n log n) function turns quadratic).
+Exponents are checked for operation counts (when available), wall times
+(with a looser tolerance, being noisier) and peak memory.
+
+Usage: python -m bench [--only NAME] [--scale FACTOR] [--tolerance T]
+                       [--time-tolerance T]
+"""
+import argparse
+import math
+import random
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+import dp
+import graphs
+import heaps
+import sorting
+from binary_trees import BinarySearchTree
+
+# input generators
+
+def random_keys(n, rng):
+    """Returns a list of n random integer keys."""
+    return [rng.randrange(10 * n) for _ in range(n)]
+
+def random_grid(n, rng, density=0.2):
+    """Returns an n by n grid of booleans (True for walkable cells), with the
+    given density of walls. The corners are always walkable.
+    >>> grid = random_grid(4, random.Random(0))
+    >>> len(grid), len(grid[0]), grid[0][0], grid[-1][-1]
+    (4, 4, True, True)
+    """
+    grid = [[rng.random() >= density for _ in range(n)] for _ in range(n)]
+    grid[0][0] = grid[-1][-1] = True
+    return grid
+
+def grid_neighbors(grid):
+    """Returns the 4-connected neighbors function of the given grid."""
+    h, w = len(grid), len(grid[0])
+    def neighbors(pos):
+        x, y = pos
+        for dx, dy in ((-1, 0), (0, 1), (1, 0), (0, -1)):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < w and 0 <= ny < h and grid[ny][nx]:
+                yield nx, ny
+    return neighbors
+
+def random_graph(n, rng, degree=4, max_cost=10):
+    """Returns a random directed graph with n nodes, as a dict mapping each
+    node to a dict of {neighbor: cost}. A path through all nodes is always
+    present, so that every node is reachable from 0.
+    """
+    graph = {u: {} for u in range(n)}
+    for u in range(n):
+        if u + 1 < n:
+            graph[u][u + 1] = rng.randint(1, max_cost)
+        for _ in range(degree - 1):
+            graph[u][rng.randrange(n)] = rng.randint(1, max_cost)
+    return graph
+
+def knapsack_instance(n, rng, max_weight=1000):
+    """Returns a list of n random (value, weight) pairs and a weight limit."""
+    items = [(rng.randint(1, 100), rng.randint(1, max_weight // 10)) for _ in range(n)]
+    return items, max_weight
+
+def text_corpus(n, rng, paragraph_length=100):
+    """Returns a text of n random words, split in paragraphs."""
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 10)))
+             for _ in range(n)]
+    return '\n\n'.join(' '.join(words[i:i + paragraph_length])
+                       for i in range(0, n, paragraph_length))
+
+def price_series(n, rng, start=100):
+    """Returns a random walk of n positive prices."""
+    prices, price = [], start
+    for _ in range(n):
+        price = max(1, price + rng.randint(-5, 5))
+        prices.append(price)
+    return prices
+
+# instrumentation
+
+class Counted(object):
+    """Wraps a key, counting the comparisons made against it in the shared
+    counter (a single-element list).
+    """
+    __slots__ = ('key', 'counter')
+
+    def __init__(self, key, counter):
+        self.key = key
+        self.counter = counter
+
+    def __lt__(self, other):
+        self.counter[0] += 1
+        return self.key < other.key
+
+    def __gt__(self, other):
+        self.counter[0] += 1
+        return self.key > other.key
+
+def counted(keys):
+    """Returns the counter and the keys wrapped so that they count their
+    comparisons.
+    """
+    counter = [0]
+    return counter, [Counted(key, counter) for key in keys]
+
+def counting(f, counter):
+    """Wraps f so that each call increments the given counter."""
+    def inner(*args, **kwargs):
+        counter[0] += 1
+        return f(*args, **kwargs)
+    return inner
+
+# benchmarks: each setup takes a size and a random generator, and returns a
+# thunk running the algorithm once, which returns an operation count or None.
+# max_exponent bounds the scaling of both operation counts and wall time,
+# max_memory_exponent bounds the scaling of the peak memory.
+
+Benchmark = namedtuple('Benchmark', ['name', 'setup', 'sizes', 'max_exponent',
+                                     'max_memory_exponent'], defaults=[1.0])
+
+def setup_astar(n, rng):
+    # no goal is ever reached, so that all reachable cells get expanded and
+    # the work is proportional to n (a goal in an open grid is found almost
+    # straight away, whatever n)
+    side = int(math.sqrt(n))
+    grid = random_grid(side, rng)
+    counter = [0]
+    neighbors = counting(grid_neighbors(grid), counter)
+    corner = (side - 1, side - 1)
+    heuristic = lambda pos: abs(corner[0] - pos[0]) + abs(corner[1] - pos[1])
+    def run():
+        graphs.astar((0, 0), neighbors, lambda u, v: 1, heuristic)
+        return counter[0]
+    return run
+
+def setup_dijkstra(n, rng):
+    graph = random_graph(n, rng)
+    counter = [0]
+    neighbors = counting(lambda u: graph[u], counter)
+    def run():
+        graphs.dijkstra(0, neighbors, lambda u, v: graph[u][v])
+        return counter[0]
+    return run
+
+def setup_knapsack(n, rng):
+    items, max_weight = knapsack_instance(n, rng)
+    return lambda: dp.knapsack(items, max_weight) and None
+
+def setup_knapsack_sparse(n, rng):
+    # huge capacity, but few distinct weights
+    items = [(rng.randint(1, 100), rng.randint(1, 5) * 10**9) for _ in range(n)]
+    max_weight = 10**11
+    return lambda: dp.knapsack_sparse(items, max_weight) and None
+
+def setup_justify(n, rng):
+    # a single paragraph of n words, so that per-paragraph costs scale with n
+    text = text_corpus(n, rng, paragraph_length=n)
+    counter = [0]
+    badness = counting(lambda w: (80 - w)**3, counter)
+    def run():
+        dp.justify(text, badness=badness)
+        return counter[0]
+    return run
+
+def setup_stock(n, rng):
+    prices = price_series(n, rng)
+    return lambda: dp.max_profit_when_buying_and_selling_stock(prices, 4) and None
+
+def setup_fib_mod(n, rng):
+    # n is the number of digits of the index, fib_mod being O(log index)
+    return lambda: dp.fib_mod(10**n, 10**9 + 7) and None
+
+def setup_heapify(n, rng):
+    counter, keys = counted(random_keys(n, rng))
+    def run():
+        heaps.heapify(keys)
+        return counter[0]
+    return run
+
+def setup_sort(sort):
+    def setup(n, rng):
+        counter, keys = counted(random_keys(n, rng))
+        def run():
+            sort(keys)
+            return counter[0]
+        return run
+    return setup
+
+def setup_bst(n, rng):
+    counter, keys = counted(random_keys(n, rng))
+    def run():
+        tree = BinarySearchTree()
+        tree.insert(*keys)
+        for key in keys:
+            tree.search(key)
+        return counter[0]
+    return run
+
+SIZES = [1000, 2000, 4000, 8000]
+
+BENCHMARKS = [
+    Benchmark('graphs.astar', setup_astar, [n * 10 for n in SIZES], 1.3),
+    Benchmark('graphs.dijkstra', setup_dijkstra, SIZES, 1.3),
+    Benchmark('dp.knapsack', setup_knapsack, SIZES, 1.2),
+    Benchmark('dp.knapsack_sparse', setup_knapsack_sparse, SIZES, 1.2),
+    Benchmark('dp.justify', setup_justify, [n * 10 for n in SIZES], 1.2),
+    Benchmark('dp.max_profit_when_buying_and_selling_stock', setup_stock, SIZES, 1.2),
+    Benchmark('dp.fib_mod', setup_fib_mod, [100, 200, 400, 800], 1.0),
+    Benchmark('heaps.heapify', setup_heapify, SIZES, 1.2),
+    Benchmark('sorting.heapsort', setup_sort(sorting.heapsort), SIZES, 1.3),
+    Benchmark('sorting.quicksort', setup_sort(sorting.quicksort), SIZES, 1.3),
+    Benchmark('sorting.mergesort', setup_sort(sorting.mergesort), SIZES, 1.3),
+    Benchmark('sorting.treesort', setup_sort(sorting.treesort), SIZES, 1.3),
+    Benchmark('binary_trees.BinarySearchTree', setup_bst, SIZES, 1.3),
+]
+
+# measurement
+
+Measurement = namedtuple('Measurement', ['size', 'seconds', 'peak_bytes', 'ops'])
+
+def measure(setup, size, seed=0, repeat=3):
+    """Runs the benchmark on the given size, returning the best time out of
+    the given number of runs, the peak memory (from a separate traced run,
+    since tracing slows everything down) and the operation count.
+    """
+    seconds = inf = float('infinity')
+    for _ in range(repeat):
+        run = setup(size, random.Random(seed))
+        start = time.perf_counter()
+        ops = run()
+        seconds = min(seconds, time.perf_counter() - start)
+    run = setup(size, random.Random(seed))
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Measurement(size, seconds if seconds < inf else 0, peak_bytes, ops)
+
+def scaling_exponent(sizes, values):
+    """Estimates k such that values ~ sizes**k, by least squares on the
+    log-log points. Non-positive values are ignored.
+    >>> round(scaling_exponent([1, 2, 4, 8], [3, 12, 48, 192]), 3)
+    2.0
+    >>> round(scaling_exponent([10, 100, 1000], [5, 50, 500]), 3)
+    1.0
+    """
+    points = [(math.log(x), math.log(y)) for x, y in zip(sizes, values) if y > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x)**2 for x, _ in points)
+    if not var_x:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+def run_benchmark(benchmark, scale=1, tolerance=0.2, time_tolerance=0.4, out=sys.stdout):
+    """Runs a benchmark over all its sizes, printing a report. Returns True if
+    all the estimated scaling exponents are within their allowed bounds: the
+    operation count (when available) and peak memory exponents within the
+    given tolerance, and the wall time exponent within time_tolerance, since
+    timings are much noisier. Checking time as well catches functions doing
+    few operations but each of growing cost (like list.pop(0)).
+    """
+    sizes = [max(1, int(size * scale)) for size in benchmark.sizes]
+    measurements = [measure(benchmark.setup, size) for size in sizes]
+    print(benchmark.name, file=out)
+    print(f"{'size':>10} {'time (s)':>12} {'peak (KiB)':>12} {'ops':>12}", file=out)
+    for m in measurements:
+        ops = '-' if m.ops is None else m.ops
+        print(f'{m.size:>10} {m.seconds:>12.6f} {m.peak_bytes / 1024:>12.1f} {ops:>12}', file=out)
+
+    checks = [('time', [m.seconds for m in measurements],
+               benchmark.max_exponent, time_tolerance),
+              ('peak memory', [m.peak_bytes for m in measurements],
+               benchmark.max_memory_exponent, tolerance)]
+    if all(m.ops is not None for m in measurements):
+        checks.insert(0, ('ops', [m.ops for m in measurements],
+                          benchmark.max_exponent, tolerance))
+    all_ok = True
+    for basis, values, max_exponent, allowed_excess in checks:
+        exponent = scaling_exponent(sizes, values)
+        ok = exponent is None or exponent <= max_exponent + allowed_excess
+        all_ok = all_ok and ok
+        shown = '-' if exponent is None else f'{exponent:.2f}'
+        print(f'  {basis} scaling exponent: {shown} (max: {max_exponent} + {allowed_excess})',
+              'ok' if ok else 'FAIL', file=out)
+    print(file=out)
+    return all_ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description=__doc__.split('\n')[0])
+    parser.add_argument('--only', action='append', default=[], metavar='NAME',
+                        help='only run benchmarks whose name contains NAME (repeatable)')
+    parser.add_argument('--scale', type=float, default=1,
+                        help='multiply all input sizes by this factor')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed excess over each maximum scaling exponent')
+    parser.add_argument('--time-tolerance', type=float, default=0.4,
+                        help='allowed excess over the maximum exponents for wall times')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    benchmarks = [b for b in BENCHMARKS
+                  if not args.only or any(name in b.name for name in args.only)]
+    if args.list:
+        for benchmark in benchmarks:
+            print(benchmark.name)
+        return 0
+    failures = [b.name for b in benchmarks
+                if not run_benchmark(b, scale=args.scale, tolerance=args.tolerance,
+                                     time_tolerance=args.time_tolerance)]
+    if failures:
+        print('Complexity regressions:', ', '.join(failures))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,54 @@
 """Practice algorithms using dynamic programming.
 """
+import hashlib
+import heapq
+import inspect
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
 from functools import wraps
-from itertools import chain
-
-# functional helpers
-fst = lambda x: x[0]
-snd = lambda x: x[1]
+from math import gcd
+from threading import RLock
 
 inf = float('infinity')
 
+def _scaled_knapsack(items, max_weight):
+    """Validates the (value, weight) pairs and divides all weights, as well as
+    the maximum weight, by their greatest common divisor, which shrinks the
+    DP row without changing the optimum. Returns the scaled items and weight.
+    """
+    divisor = 0
+    for _, weight in items:
+        if weight < 0:
+            raise ValueError(f'item weights cannot be < 0 (got {weight})')
+        divisor = gcd(divisor, weight)
+    if divisor <= 1:
+        return list(items), max_weight
+    return [(value, weight // divisor) for value, weight in items], max_weight // divisor
+
+def _knapsack_row(items, max_weight):
+    """Returns the list of maximum values attainable for each weight limit from
+    0 up to max_weight, for already validated items (see _scaled_knapsack).
+    Keeps a single rolling DP row in memory, each item being folded in with a
+    slice-wise max, so the inner loop runs at C speed.
+    >>> _knapsack_row([(0, 1), (2, 3), (2, 1), (4, 1)], 3)
+    [0, 4, 6, 6]
+    >>> _knapsack_row([(3, 0), (1, 1)], 1)
+    [3, 4]
+    """
+    row = [0] * (max_weight + 1)
+    for value, weight in items:
+        if value <= 0 or weight > max_weight:
+            continue
+        if weight == 0:
+            row[:] = [v + value for v in row]
+        else:
+            row[weight:] = map(max, row[weight:],
+                               [v + value for v in row[:max_weight + 1 - weight]])
+    return row
+
 def knapsack(items, max_weight):
     """Returns the maximum value attainable with the given (value, weight)
     pairs, without surpassing the maximum weight provided.
@@ -16,8 +56,12 @@ def knapsack(items, max_weight):
     0
     >>> knapsack([(1, 2)], 0)
     0
+    >>> knapsack([(5, 0)], 0), knapsack_items([(5, 0)], 0), knapsack_sparse([(5, 0)], 0)
+    (5, (5, [0]), 5)
     >>> knapsack([(0, 1), (2, 3), (2, 1), (4, 1)], 3)
     6
+    >>> knapsack([(5, 1000), (4, 2000), (3, 3000)], 4999)
+    9
     >>> knapsack([(1, 1)], -1)
     Traceback (most recent call last):
         ...
@@ -29,38 +73,361 @@ def knapsack(items, max_weight):
     """
     if max_weight < 0:
         raise ValueError(f'max_weight cannot be < 0 (got {max_weight})')
-    if not items or not max_weight:
+    if not items:
         return 0
-    x = [[0 for _ in range(max_weight + 1)] for _ in range(len(items) + 1)]
-    for i, (value, weight) in enumerate(items, start=1):
+    items, max_weight = _scaled_knapsack(items, max_weight)
+    return _knapsack_row(items, max_weight)[max_weight]
+
+def knapsack_items(items, max_weight):
+    """Returns the maximum value attainable along with the (sorted) indices of
+    the items achieving it. Items are reconstructed Hirschberg-style: the items
+    are split in two halves, the best weight split between them is found from
+    two DP rows, and each half is solved recursively, so memory stays O(W).
+    >>> knapsack_items([(0, 1), (2, 3), (2, 1), (4, 1)], 3)
+    (6, [2, 3])
+    >>> knapsack_items([(60, 10), (100, 20), (120, 30)], 50)
+    (220, [1, 2])
+    >>> knapsack_items([], 3)
+    (0, [])
+    """
+    if max_weight < 0:
+        raise ValueError(f'max_weight cannot be < 0 (got {max_weight})')
+    scaled_items, scaled_max_weight = _scaled_knapsack(items, max_weight)
+    chosen = []
+
+    def recurse(start, end, capacity):
+        if end - start == 1:
+            value, weight = scaled_items[start]
+            if value > 0 and weight <= capacity:
+                chosen.append(start)
+            return
+        middle = (start + end) // 2
+        left = _knapsack_row(scaled_items[start:middle], capacity)
+        right = _knapsack_row(scaled_items[middle:end], capacity)
+        split = max(range(capacity + 1), key=lambda c: left[c] + right[capacity - c])
+        recurse(start, middle, split)
+        recurse(middle, end, capacity - split)
+
+    if scaled_items:
+        recurse(0, len(scaled_items), scaled_max_weight)
+    return sum(items[i][0] for i in chosen), chosen
+
+def knapsack_sparse(items, max_weight):
+    """Returns the maximum value attainable with the given (value, weight)
+    pairs, like knapsack(), but only keeps the Pareto frontier of reachable
+    (weight, value) pairs instead of a row indexed by weight. Pairs that are
+    heavier yet not more valuable than another are pruned, which makes this
+    suitable for huge capacities with few distinct reachable weights.
+    >>> knapsack_sparse([(0, 1), (2, 3), (2, 1), (4, 1)], 3)
+    6
+    >>> knapsack_sparse([(5, 10**12), (4, 2 * 10**12), (3, 3 * 10**12)], 5 * 10**12)
+    9
+    >>> knapsack_sparse([], 1)
+    0
+    """
+    if max_weight < 0:
+        raise ValueError(f'max_weight cannot be < 0 (got {max_weight})')
+    frontier = [(0, 0)]
+    for value, weight in items:
         if weight < 0:
             raise ValueError(f'item weights cannot be < 0 (got {weight})')
-        for w in range(max_weight + 1):
-            if weight > w:
-                x[i][w] = x[i-1][w]
+        if value <= 0 or weight > max_weight:
+            continue
+        shifted = [(w + weight, v + value) for w, v in frontier if w + weight <= max_weight]
+        merged = []
+        for w, v in heapq.merge(frontier, shifted, key=lambda wv: (wv[0], -wv[1])):
+            if not merged or v > merged[-1][1]:
+                merged.append((w, v))
+        frontier = merged
+    return frontier[-1][1]
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+_kwargs_mark = object()
+
+# marks sets and dicts in canonicalized arguments, with their items sorted
+_Unordered = namedtuple('_Unordered', ['type', 'items'])
+
+def _canonical(value):
+    """Returns the value with the items of sets and dicts sorted (by their
+    pickled form), recursively, so that equal arguments pickle to the same
+    bytes whatever the hash seed of the process.
+    """
+    if type(value) in (list, tuple):
+        # subclasses (such as named tuples) are left to pickle with their type
+        return type(value)(_canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        items = [_canonical(item) for item in value]
+    elif isinstance(value, dict):
+        items = [(_canonical(k), _canonical(v)) for k, v in value.items()]
+    else:
+        return value
+    items.sort(key=lambda item: pickle.dumps(item, protocol=4))
+    return _Unordered(type(value).__name__, tuple(items))
+
+# connections inherited through a fork, which must not be closed by the child
+# (closing them could checkpoint or remove the WAL under the parent's feet)
+_forked_connections = []
+
+class SqliteStore(object):
+    """Persistent memoization backend, storing pickled results in an sqlite3
+    database so that they survive process restarts.
+
+    Entries are keyed by the function's qualified name and a SHA-256 of the
+    pickled (canonicalized) arguments. Each function is versioned, by default
+    with a hash of the source of the whole module defining it, so that changes
+    to helpers from the same module invalidate its entries too; pass an
+    explicit version to depend on anything else. Entries written by another
+    version are dropped when the function is bound to the store. When
+    max_entries is given, the oldest entries are evicted on insertion. The
+    database runs in WAL mode with a busy timeout, so several worker processes
+    may share it; after a fork, the child opens its own connection and keeps
+    the inherited one referenced without ever closing it.
+    """
+    def __init__(self, path, max_entries=None, timeout=30.0):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f'max_entries cannot be < 1 (got {max_entries})')
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._lock = RLock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            if self._connection is not None:
+                _forked_connections.append(self._connection)
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS memo ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                               'function TEXT NOT NULL, version TEXT NOT NULL, '
+                               'key BLOB NOT NULL, value BLOB NOT NULL, '
+                               'UNIQUE (function, key))')
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def close(self):
+        """Closes this process' connection, it is reopened on the next use."""
+        with self._lock:
+            if self._connection is not None:
+                if self._pid == os.getpid():
+                    self._connection.close()
+                else:
+                    _forked_connections.append(self._connection)
+            self._connection = None
+
+    @staticmethod
+    def function_name(f):
+        """Returns the qualified name the function's entries are stored under."""
+        return f'{f.__module__}.{f.__qualname__}'
+
+    @staticmethod
+    def function_version(f):
+        """Returns a hash of the source of the module defining the function
+        (or of the function's own source or bytecode, if the module's source
+        isn't available), used to invalidate stale entries.
+        """
+        try:
+            source = inspect.getsource(inspect.getmodule(f)).encode()
+        except (OSError, TypeError):
+            try:
+                source = inspect.getsource(f).encode()
+            except (OSError, TypeError):
+                source = f.__code__.co_code
+        return hashlib.sha256(source).hexdigest()
+
+    def bind(self, f, version=None):
+        """Returns the (name, version) namespace of the given function,
+        dropping any entries left by other versions of it. The version
+        defaults to function_version(f).
+        """
+        name = self.function_name(f)
+        version = self.function_version(f) if version is None else str(version)
+        with self._lock:
+            self._connect().execute('DELETE FROM memo WHERE function = ? AND version != ?',
+                                    (name, version))
+        return name, version
+
+    @staticmethod
+    def key(args, kwargs):
+        """Returns a stable hash of the given call arguments.
+        >>> SqliteStore.key(({'b', 'a'},), {}) == SqliteStore.key(({'a', 'b'},), {})
+        True
+        >>> SqliteStore.key(({'a'},), {}) == SqliteStore.key((frozenset('a'),), {})
+        False
+        """
+        payload = pickle.dumps(_canonical((args, kwargs)), protocol=4)
+        return hashlib.sha256(payload).digest()
+
+    def get(self, namespace, key):
+        """Returns the stored value, raising a KeyError if there is none."""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value FROM memo WHERE function = ? AND version = ? AND key = ?',
+                (*namespace, key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def set(self, namespace, key, value):
+        """Stores the value, evicting the oldest entries if over capacity."""
+        payload = pickle.dumps(value, protocol=4)
+        with self._lock:
+            connection = self._connect()
+            connection.execute('INSERT OR REPLACE INTO memo (function, version, key, value) '
+                               'VALUES (?, ?, ?, ?)', (*namespace, key, payload))
+            if self.max_entries is not None:
+                connection.execute('DELETE FROM memo WHERE id IN (SELECT id FROM memo '
+                                   'ORDER BY id DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self, f=None):
+        """Removes the stored entries of the given function (memoized or not),
+        or all of them. This affects every process sharing the database.
+        """
+        with self._lock:
+            if f is None:
+                self._connect().execute('DELETE FROM memo')
             else:
-                x[i][w] = max(x[i-1][w], x[i-1][w-weight] + value)
-    return x[len(items)][max_weight]
+                self._connect().execute('DELETE FROM memo WHERE function = ?',
+                                        (self.function_name(f),))
+
+def memoize(f=None, *, maxsize=None, thread_safe=False, store=None, version=None):
+    """Generic memoization decorator, requires arguments to be hashable (or
+    only picklable, with a store).
+
+    Can be used bare (@memoize) or with options (@memoize(maxsize=128)). When
+    maxsize is given, the least recently used entry is evicted once the cache
+    holds that many values, otherwise the cache is unbounded. Pass
+    thread_safe=True to guard the cache with a lock; the wrapped function
+    itself runs outside of the lock, so recursive calls don't deadlock.
+
+    An optional persistent store (see SqliteStore) is looked up on in-memory
+    misses and filled with every computed value, its entries being versioned
+    by the given version or SqliteStore.function_version(f). With a store,
+    arguments only need to be picklable: unhashable calls skip the in-memory
+    cache.
+
+    The decorated function exposes cache_info() and cache_clear(), the latter
+    only clearing the in-memory cache (see SqliteStore.clear()).
+    >>> @memoize(maxsize=2)
+    ... def square(x):
+    ...     return x * x
+    >>> [square(x) for x in (1, 2, 1, 3, 2)]
+    [1, 4, 1, 9, 4]
+    >>> square.cache_info()
+    CacheInfo(hits=1, misses=4, evictions=2, maxsize=2, currsize=2)
+    >>> square.cache_clear()
+    >>> square.cache_info()
+    CacheInfo(hits=0, misses=0, evictions=0, maxsize=2, currsize=0)
+    >>> import os, tempfile
+    >>> directory = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(directory.name, 'memo.db')
+    >>> store = SqliteStore(path)
+    >>> persistent_knapsack = memoize(knapsack, store=store)
+    >>> persistent_knapsack([(2, 3), (2, 1), (4, 1)], 3)
+    6
+    >>> store.close()
+    >>> restarted_store = SqliteStore(path)
+    >>> restarted_knapsack = memoize(knapsack, store=restarted_store)
+    >>> restarted_knapsack([(2, 3), (2, 1), (4, 1)], 3)
+    6
+    >>> restarted_knapsack.cache_info()
+    CacheInfo(hits=1, misses=0, evictions=0, maxsize=None, currsize=0)
+    >>> restarted_store.close()
+    >>> directory.cleanup()
+    >>> memoize(maxsize=0)
+    Traceback (most recent call last):
+        ...
+    ValueError: maxsize cannot be < 1 (got 0)
+    """
+    if maxsize is not None and maxsize < 1:
+        raise ValueError(f'maxsize cannot be < 1 (got {maxsize})')
+    if f is None:
+        return lambda f: memoize(f, maxsize=maxsize, thread_safe=thread_safe,
+                                 store=store, version=version)
+
+    m = OrderedDict()
+    stats = [0, 0, 0] # hits, misses, evictions
+    lock = RLock() if thread_safe else nullcontext()
+    namespace = store.bind(f, version) if store is not None else None
 
-def memoize(f):
-    """Generic memoization decorator, requires arguments to be hashable."""
-    m = {}
     @wraps(f)
     def inner(*args, **kwargs):
-        key = (tuple(args), tuple(kwargs.items()))
-        try:
-            return m[key]
-        except KeyError:
+        # positional-only calls use the args tuple itself as the key
+        key = args + (_kwargs_mark,) + tuple(kwargs.items()) if kwargs else args
+        hashable = True
+        with lock:
+            try:
+                value = m[key]
+            except KeyError:
+                pass
+            except TypeError:
+                if store is None:
+                    raise
+                hashable = False
+            else:
+                stats[0] += 1
+                if maxsize is not None:
+                    m.move_to_end(key)
+                return value
+        if store is not None:
+            store_key = store.key(args, kwargs)
+            try:
+                value = store.get(namespace, store_key)
+            except KeyError:
+                value = f(*args, **kwargs)
+                store.set(namespace, store_key, value)
+                stats_index = 1
+            else:
+                stats_index = 0
+        else:
             value = f(*args, **kwargs)
-            m[key] = value
-            return value
+            stats_index = 1
+        with lock:
+            stats[stats_index] += 1
+            if hashable:
+                m[key] = value
+                if maxsize is not None and len(m) > maxsize:
+                    m.popitem(last=False)
+                    stats[2] += 1
+        return value
+
+    def cache_info():
+        with lock:
+            return CacheInfo(*stats, maxsize, len(m))
+
+    def cache_clear():
+        with lock:
+            m.clear()
+            stats[:] = [0, 0, 0]
+
+    inner.cache_info = cache_info
+    inner.cache_clear = cache_clear
     return inner
 
-@memoize
+def _fib_pair(n, m=None):
+    """Returns the (F(n), F(n+1)) pair of standard Fibonacci numbers (with
+    F(0) = 0), optionally modulo m, using the fast doubling identities
+    F(2k) = F(k)(2F(k+1) - F(k)) and F(2k+1) = F(k)^2 + F(k+1)^2.
+    """
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        a, b = a * (2 * b - a), a * a + b * b
+        if bit == '1':
+            a, b = b, a + b
+        if m is not None:
+            a, b = a % m, b % m
+    return a, b
+
 def fib(n):
-    """Compute the nth Fibonacci number.
+    """Compute the nth Fibonacci number, in O(log n) arithmetic operations.
     >>> [fib(n) for n in range(10+1)]
     [1, 1, 1, 2, 3, 5, 8, 13, 21, 34, 55]
+    >>> len(str(fib(5000)))
+    1045
     >>> fib(-1)
     Traceback (most recent call last):
         ...
@@ -68,55 +435,167 @@ def fib(n):
     """
     if n < 0:
         raise ValueError(f"Cannot compute Fibonacci number for n < 0 (got {n})")
-    if n <= 2:
+    if n == 0:
         return 1
-    return fib(n-2) + fib(n-1)
+    return _fib_pair(n)[0]
 
-def justify(text, line_width=80, add_spaces=True, badness=None):
-    """Returns the text justified to the given line width."""
+def fib_mod(n, m):
+    """Compute the nth Fibonacci number modulo m, keeping all intermediate
+    values below m so that huge n stay cheap.
+    >>> [fib_mod(n, 10) for n in range(10+1)]
+    [1, 1, 1, 2, 3, 5, 8, 3, 1, 4, 5]
+    >>> fib_mod(10**18, 10**9 + 7)
+    209783453
+    >>> fib_mod(1, 0)
+    Traceback (most recent call last):
+        ...
+    ValueError: Modulus cannot be < 1 (got 0)
+    """
+    if n < 0:
+        raise ValueError(f"Cannot compute Fibonacci number for n < 0 (got {n})")
+    if m < 1:
+        raise ValueError(f"Modulus cannot be < 1 (got {m})")
+    if n == 0:
+        return 1 % m
+    return _fib_pair(n, m)[0]
+
+def fib_many(ns):
+    """Compute the Fibonacci numbers for all the given indices, in the order
+    given. The indices are visited in sorted order in a single pass: small gaps
+    are walked step by step, larger ones jumped over with the addition formula
+    F(n+d) = F(d)F(n+1) + F(d-1)F(n).
+    >>> fib_many([10, 0, 3, 1, 10, 2])
+    [55, 1, 2, 1, 55, 1]
+    >>> fib_many([5000, 4999, 1000])[0] == fib(5000)
+    True
+    """
+    ns = list(ns)
+    for n in ns:
+        if n < 0:
+            raise ValueError(f"Cannot compute Fibonacci number for n < 0 (got {n})")
+    results = {}
+    current, (a, b) = 0, (0, 1) # (F(current), F(current+1))
+    for n in sorted(set(ns)):
+        gap = n - current
+        if gap <= 64:
+            for _ in range(gap):
+                a, b = b, a + b
+        else:
+            fd_prev, fd = _fib_pair(gap - 1)
+            fd_next = fd_prev + fd
+            a, b = fd * b + fd_prev * a, fd_next * b + fd * a
+        current = n
+        results[n] = a if n else 1
+    return [results[n] for n in ns]
+
+def break_lines(words, line_width=80, badness=None):
+    """Splits the given list of words into lines of at most line_width, such
+    that the total badness of the lines is minimal. Yields each line as a list
+    of words.
+
+    The line widths count the space following each word, except on the last
+    line. The DP runs backwards over the words, recording where the best line
+    starting at each word ends, and stops extending a line as soon as it
+    overflows, so it takes O(n*L) time for L = line_width. A word longer than
+    line_width is put on a line of its own.
+    >>> list(break_lines("aaa bb cc ddddd".split(), 6))
+    [['aaa'], ['bb', 'cc'], ['ddddd']]
+    >>> list(break_lines("aaaaaaa aaa aaaaaa".split(), 8))
+    [['aaaaaaa'], ['aaa'], ['aaaaaa']]
+    >>> list(break_lines("a bbbbbbbbbb c".split(), 5))
+    [['a'], ['bbbbbbbbbb'], ['c']]
+    """
     if badness is None:
         badness = lambda w: (line_width - w)**3
-    assert badness(line_width == 0) and badness(0) > badness(1), "Invalid badness function"
-    text = " ".join([""] + text.split()) # normalize whitespace
-    word_indices = [i+1 for i, (x, y) in enumerate(zip(text, text[1:])) if x == ' ' and y != ' ']
-
-    @memoize
-    def score_leading_word(i):
-        if i == len(word_indices):
-            return 0
-        max_score = None
-        for j in range(i+1, len(word_indices)+1):
-            end = word_indices[j] if j < len(word_indices) else len(text)
-            width = end - word_indices[i]
-            score = score_leading_word(j) - badness(width) if width <= line_width else -inf
-            if max_score is None or score > max_score:
-                max_score = score
-        return max_score
-
-    # leading words will be those with a *larger* score than the previous
-    scores = [(wi, -score_leading_word(i)) for i, wi in enumerate(word_indices)]
-    xs = list(map(fst, filter(lambda iw: iw[1] < 0,
-                              map(lambda wiw: (wiw[1][0], wiw[1][1] - wiw[0]),
-                                  zip(chain([inf], map(snd, scores)), scores)))))
-
-    # build the result, potentially adding spaces
-    result = ""
-    for i, j in zip(xs, chain(xs[1:], [len(text)])):
-        if i > 1:
-            result += "\n"
-        line = text[i:j].strip()
-        words = line.split()
-        if add_spaces and len(words) > 1:
-            i = 0
-            nb_spaces_to_add = line_width - len(line)
-            while nb_spaces_to_add > 0:
-                words[i] += " "
-                nb_spaces_to_add -= 1
-                i = (i + 1) % (len(words) - 1)
-            result += " ".join(words)
-        else:
-            result += line
-    return result
+    n = len(words)
+    cost = [0] * (n + 1)
+    next_break = [n] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        best = None
+        width = -1
+        for j in range(i + 1, n + 1):
+            width += len(words[j-1]) + 1
+            line_width_used = width + 1 if j < n else width
+            if line_width_used <= line_width:
+                line_cost = badness(line_width_used)
+            elif j == i + 1:
+                line_cost = 0
+            else:
+                break
+            if best is None or cost[j] + line_cost < best:
+                best = cost[j] + line_cost
+                next_break[i] = j
+        cost[i] = best
+    i = 0
+    while i < n:
+        yield words[i:next_break[i]]
+        i = next_break[i]
+
+def justify_line(words, line_width=80, add_spaces=True):
+    """Joins the words of a line, spreading extra spaces from the left so that
+    the line is exactly line_width wide if add_spaces is set. Words are always
+    separated by at least one space, even when the line overflows.
+    >>> justify_line(['a', 'b', 'c'], 8)
+    'a   b  c'
+    >>> justify_line(['aaaaaaa', 'aaa'], 8)
+    'aaaaaaa aaa'
+    """
+    if not add_spaces or len(words) < 2:
+        return " ".join(words)
+    gaps = len(words) - 1
+    spaces, remainder = divmod(max(gaps, line_width - sum(map(len, words))), gaps)
+    gaps = [" " * (spaces + 1)] * remainder + [" " * spaces] * (gaps - remainder)
+    return "".join(w + s for w, s in zip(words, gaps)) + words[-1]
+
+def _check_badness(badness, line_width):
+    if badness is None:
+        badness = lambda w: (line_width - w)**3
+    assert badness(line_width) == 0 and badness(0) > badness(1), "Invalid badness function"
+    return badness
+
+def justify(text, line_width=80, add_spaces=True, badness=None):
+    """Returns the text justified to the given line width."""
+    badness = _check_badness(badness, line_width)
+    lines = break_lines(text.split(), line_width, badness)
+    return "\n".join(justify_line(words, line_width, add_spaces) for words in lines)
+
+def paragraphs(lines):
+    """Groups an iterable of lines (such as a file) into paragraphs, separated
+    by blank lines. Yields the words of each paragraph.
+    >>> list(paragraphs(["a b", "c", "", "", "d"]))
+    [['a', 'b', 'c'], ['d']]
+    """
+    words = []
+    for line in lines:
+        line_words = line.split()
+        if line_words:
+            words.extend(line_words)
+        elif words:
+            yield words
+            words = []
+    if words:
+        yield words
+
+def justify_stream(lines, out, line_width=80, add_spaces=True, badness=None):
+    """Justifies the text read from an iterable of lines (such as a file)
+    paragraph by paragraph, writing the result to the out stream. Paragraphs
+    are separated by a blank line in the output. Only one paragraph is held in
+    memory at a time.
+    >>> import io, sys
+    >>> justify_stream(io.StringIO("aaa bb\\ncc ddddd\\n\\n\\nee ff"), sys.stdout, 6)
+    aaa
+    bb  cc
+    ddddd
+    <BLANKLINE>
+    ee  ff
+    """
+    badness = _check_badness(badness, line_width)
+    for n, words in enumerate(paragraphs(lines)):
+        if n:
+            out.write("\n")
+        for line in break_lines(words, line_width, badness):
+            out.write(justify_line(line, line_width, add_spaces))
+            out.write("\n")
 
 def test_justification():
     given = ("In the common walks of life, with what delightful emotions does the "
@@ -127,10 +606,10 @@ def test_justification():
             "snowy robes, is whirling through the mazes of the joyous dance; her "
             "eye is brightest, her step is lightest in the gay assembly.")
 
-    expected = ("In   the   common  walks  of  life,  with  what  delightful  emotions  does  the" "\n"
-                "youthful  mind  look forward to some anticipated scene of festivity! Imagination" "\n"
-                "is  busy  sketching rose-tinted pictures of joy. In fancy, the voluptuous votary" "\n"
-                "of  fashion sees herself amid the festive throng, the observed of all observers." "\n"
+    expected = ("In  the  common  walks  of life, with what delightful emotions does the youthful" "\n"
+                "mind  look  forward  to some anticipated scene of festivity! Imagination is busy" "\n"
+                "sketching  rose-tinted  pictures  of  joy.  In  fancy,  the voluptuous votary of" "\n"
+                "fashion  sees  herself  amid  the festive throng, the observed of all observers." "\n"
                 "Her  graceful form, arrayed in snowy robes, is whirling through the mazes of the" "\n"
                 "joyous  dance;  her  eye is brightest, her step is lightest in the gay assembly.")
 
@@ -152,45 +631,89 @@ def test_justification():
 def max_profit_when_buying_and_selling_stock(prices, K):
     """Computes the maximum profit that can be made by buying/selling stock at
     most K times for the given prices, without overlap between transactions.
+
+    This runs in O(n*K) time and O(K) memory by tracking, for each number of
+    transactions k, the best cash balance while holding and while not holding
+    stock. When K >= n/2 the limit can't bind, so every rise is taken greedily.
     >>> max_profit_when_buying_and_selling_stock([3, 2, 6, 5, 0, 3], 2)
     7
     >>> max_profit_when_buying_and_selling_stock([2, 4, 1], 2)
     2
     >>> max_profit_when_buying_and_selling_stock([6, 1, 3, 2, 4, 7], 2)
     7
+    >>> max_profit_when_buying_and_selling_stock([6, 1, 3, 2, 4, 7], 1)
+    6
+    >>> max_profit_when_buying_and_selling_stock([1, 2, 3, 0, 2], -1)
+    Traceback (most recent call last):
+        ...
+    ValueError: K cannot be < 0 (got -1)
     """
+    if K < 0:
+        raise ValueError(f'K cannot be < 0 (got {K})')
     if not prices or K == 0:
         return 0
+    if K >= len(prices) // 2:
+        return sum(max(0, y - x) for x, y in zip(prices, prices[1:]))
+    holding = [-inf] * (K + 1)
+    not_holding = [0] * (K + 1)
+    for price in prices:
+        for k in range(1, K + 1):
+            holding[k] = max(holding[k], not_holding[k-1] - price)
+            not_holding[k] = max(not_holding[k], holding[k] + price)
+    return not_holding[K]
 
-    def profit(i, j):
-        i1, j1 = i, i
-        min_, max_ = prices[i1], prices[j1]
-        while j1 <= j:
-            if prices[j1] > max_:
-                max_ = prices[j1]
-                while i1 < j1:
-                    if prices[i1] < min_:
-                        min_ = prices[i1]
-                        break
-                    i1 += 1
-                break
-            j1 += 1
-        return max_ - min_
-
-    @memoize
-    def recurse(i, j, k):
-        if k == 0:
-            return 0
-        max_profit = profit(i, j)
-        for x in range(i+1, j):
-            split_profit = recurse(i, x, k-1) + recurse(x, j, 1)
-            if split_profit > max_profit:
-                max_profit = split_profit
-            split_profit = recurse(i, x, 1) + recurse(x, j, k-1)
-            if split_profit > max_profit:
-                max_profit = split_profit
-        return max_profit
-    return recurse(0, len(prices)-1, K)
+def stream_max_profit(prices, K=None):
+    """Same as max_profit_when_buying_and_selling_stock(), but consumes the
+    prices from any iterable (only the current price is kept) and also reports
+    the trades taken, as (buy_index, sell_index) pairs. K=None lifts the limit
+    on the number of transactions, in which case every rise is taken.
+
+    Trades are kept as linked (trade, previous) pairs shared between states, so
+    memory is O(K) plus the trades on the surviving chains.
+    >>> stream_max_profit(iter([3, 2, 6, 5, 0, 3]), 2)
+    (7, [(1, 2), (4, 5)])
+    >>> stream_max_profit([6, 1, 3, 2, 4, 7], 1)
+    (6, [(1, 5)])
+    >>> stream_max_profit([1, 2, 3, 0, 2])
+    (4, [(0, 2), (3, 4)])
+    >>> stream_max_profit([1, 2, 2, 3])
+    (2, [(0, 1), (2, 3)])
+    >>> stream_max_profit([], 3)
+    (0, [])
+    """
+    if K is not None and K < 0:
+        raise ValueError(f'K cannot be < 0 (got {K})')
+    if K is None:
+        # consecutive rises are merged into a single trade
+        profit, trades, previous = 0, [], None
+        for i, price in enumerate(prices):
+            if previous is not None and price > previous:
+                profit += price - previous
+                if trades and trades[-1][1] == i - 1:
+                    trades[-1] = (trades[-1][0], i)
+                else:
+                    trades.append((i - 1, i))
+            previous = price
+        return profit, trades
+
+    # holding[k] is (cash, trades, buy_index), not_holding[k] is (cash, trades)
+    holding = [(-inf, None, None)] * (K + 1)
+    not_holding = [(0, None)] * (K + 1)
+    for i, price in enumerate(prices):
+        for k in range(1, K + 1):
+            cash, trades = not_holding[k-1]
+            if cash - price > holding[k][0]:
+                holding[k] = (cash - price, trades, i)
+            cash, trades, bought = holding[k]
+            if cash + price > not_holding[k][0]:
+                not_holding[k] = (cash + price, ((bought, i), trades))
+    profit, node = not_holding[K]
+    trades = []
+    while node is not None:
+        trade, node = node
+        trades.append(trade)
+    trades.reverse()
+    return profit, trades
 
 if __name__ == "__main__":
     import doctest; doctest.testmod()
@@ -68,7 +68,7 @@ def mergesort(array, reverse=False):
 def treesort(array, reverse=False):
     # sort an array using a binary tree insertion algorithm
     comp = op.gt if reverse else op.lt
-    tree = BinarySearchTree(comp)
+    tree = BinarySearchTree(comp=comp)
     for elem in array:
         tree.insert(elem)
     return list(map(lambda n: n.key, tree.in_order_traversal()))
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+from dp import SqliteStore, knapsack, memoize
+
+calls = [0]
+
+def counted_knapsack(items, max_weight):
+    calls[0] += 1
+    return knapsack(items, max_weight)
+
+persistent_knapsack = None
+
+def instance(i):
+    return [(i % 7 + 1, 2), (3, i % 5 + 1)], i % 40
+
+def solve(i):
+    return persistent_knapsack(*instance(i))
+
+def test_store_shared_by_forked_workers(tmp_path):
+    """Forked workers should share the parent's store (which already has an
+    open connection), and a restarted process should then find every result
+    without recomputing anything.
+    """
+    global persistent_knapsack
+    path = str(tmp_path / 'memo.db')
+    store = SqliteStore(path)
+    persistent_knapsack = memoize(counted_knapsack, store=store)
+    persistent_knapsack(*instance(0))
+
+    context = multiprocessing.get_context('fork')
+    with context.Pool(8) as pool:
+        results = pool.map(solve, range(400))
+    expected = [knapsack(*instance(i)) for i in range(400)]
+    assert results == expected
+
+    calls[0] = 0
+    restarted_store = SqliteStore(path)
+    restarted_knapsack = memoize(counted_knapsack, store=restarted_store)
+    assert [restarted_knapsack(*instance(i)) for i in range(400)] == expected
+    assert calls[0] == 0
+    assert restarted_knapsack.cache_info().misses == 0
+    store.close()
+    restarted_store.close()
+
+def test_store_version_invalidates_entries(tmp_path):
+    """Binding a function under another version should drop its entries."""
+    path = str(tmp_path / 'memo.db')
+    calls[0] = 0
+    stores = [SqliteStore(path) for _ in range(3)]
+    try:
+        memoize(counted_knapsack, store=stores[0], version=1)([(1, 1)], 1)
+        memoize(counted_knapsack, store=stores[1], version=1)([(1, 1)], 1)
+        assert calls[0] == 1
+        memoize(counted_knapsack, store=stores[2], version=2)([(1, 1)], 1)
+        assert calls[0] == 2
+    finally:
+        for store in stores:
+            store.close()
+
+def square(x):
+    return x * x
+
+def cube(x):
+    return x * x * x
+
+def test_store_eviction_keeps_max_entries(tmp_path):
+    """Eviction should keep the max_entries newest rows, even when ids have
+    gaps left by cleared entries.
+    """
+    store = SqliteStore(str(tmp_path / 'memo.db'), max_entries=3)
+    try:
+        memoized_square = memoize(square, store=store)
+        memoized_cube = memoize(cube, store=store)
+        memoized_square(1)
+        memoized_cube(1)
+        memoized_square(2)
+        memoized_cube(2)
+        store.clear(square)
+        memoized_cube(3)
+        rows = store._connect().execute('SELECT COUNT(*) FROM memo').fetchone()[0]
+        assert rows == 3
+        for i in range(4, 10):
+            memoized_cube(i)
+        rows = store._connect().execute('SELECT COUNT(*) FROM memo').fetchone()[0]
+        assert rows == 3
+    finally:
+        store.close()
+
+Point = namedtuple('Point', 'x y')
+
+def test_store_key_distinguishes_tuple_subclasses():
+    """A named tuple and a plain tuple with the same items are different
+    arguments, and should not share entries.
+    """
+    assert SqliteStore.key((Point(1, 2),), {}) != SqliteStore.key(((1, 2),), {})
+    assert SqliteStore.key(([{2, 1}],), {}) == SqliteStore.key(([{1, 2}],), {})
+
+def test_store_key_independent_of_hash_seed():
+    """Keys of unordered arguments should be the same in every process."""
+    code = ("from dp import SqliteStore;"
+            "print(SqliteStore.key((frozenset('abcd'),), {'k': {'x', 'y'}}).hex())")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    keys = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        keys.add(subprocess.check_output([sys.executable, '-c', code], cwd=root, env=env))
+    assert len(keys) == 1
@@ -0,0 +1,10 @@
+from sorting import treesort
+
+def test_treesort():
+    """Sorting with a binary tree should give the same result as sorted(),
+    in both orders, keeping duplicate keys.
+    """
+    array = [37, 8, 41, 33, 26, 18, 41, 16, 10, 6, 14, 3, 35, 11, 6]
+    assert treesort(array) == sorted(array)
+    assert treesort(array, reverse=True) == sorted(array, reverse=True)
+    assert treesort([]) == []